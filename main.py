@@ -1,13 +1,24 @@
-from fastapi import FastAPI, Request, Depends, Form, HTTPException, Header
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, Depends, Form, HTTPException, Header, Query
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel, Field
-from typing import Optional
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from pydantic import AfterValidator, BaseModel, Field, StringConstraints
+from typing import Annotated, Optional
+from contextlib import contextmanager
+from functools import lru_cache
+import asyncio
+import hashlib
+import hmac
 import sqlite3
 import pathlib
-import datetime
 import os
+import queue
+import re
+import threading
+import time
+from urllib.parse import parse_qs
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 from dotenv import load_dotenv
 
@@ -16,72 +27,408 @@ BASE_DIR = pathlib.Path(__file__).parent
 DB_PATH = BASE_DIR / "app.db"
 TEMPLATES_DIR = BASE_DIR / "templates"
 STATIC_DIR = BASE_DIR / "static"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+SERVICES_CACHE_TTL = 60.0
+# Asset URLs from static_url() carry a content hash, so browsers may keep them
+STATIC_IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Public pages whose rendered HTML is cached for anonymous visitors
+CACHED_PAGES = {"/", "/about", "/services"}
+PAGE_CACHE_MAX_ENTRIES = 256
+FEEDBACK_PAGE_SIZE = 20
+FEEDBACK_PAGE_SIZE_MAX = 100
+# Keeps (page - 1) * size well inside SQLite's 64-bit OFFSET
+FEEDBACK_PAGE_MAX = 1_000_000
+DB_CACHED_STATEMENTS = 256
+ANALYZE_INTERVAL = 3600.0
+
+# Long-lived connections shared by all requests, filled in on startup
+_POOL: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+
+# Per-connection settings, applied once when a connection is opened
+CONNECTION_PRAGMAS = """
+    PRAGMA foreign_keys=ON;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+"""
+
+# UTC timestamp in the same ISO-8601 shape the existing rows use
+SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+
+# SQL used by request handlers. Keeping each statement as a single constant
+# string lets the per-connection statement cache reuse the prepared form.
+SQL_FETCH_ALL = "SELECT id, name, description FROM services ORDER BY name ASC"
+# Ratings are denormalized onto services and maintained by feedback triggers
+SQL_FETCH_RATINGS = """
+    SELECT id, name, description, avg_rating, review_count
+    FROM services
+    ORDER BY avg_rating DESC, review_count DESC
+"""
+SQL_FILTER_RATINGS = """
+    SELECT id, name, description, avg_rating, review_count
+    FROM services
+    WHERE avg_rating >= ?
+    ORDER BY avg_rating DESC, review_count DESC
+"""
+# Params: (fts_query, min_rating, min_rating); NULL min_rating disables it
+SQL_SEARCH_RATINGS = """
+    SELECT s.id, s.name, s.description, s.avg_rating, s.review_count
+    FROM services_fts
+    JOIN services s ON s.id = services_fts.rowid
+    WHERE services_fts MATCH ? AND (? IS NULL OR s.avg_rating >= ?)
+    ORDER BY s.avg_rating DESC, s.review_count DESC
+"""
+SQL_FETCH_SERVICE = "SELECT id, name, description FROM services WHERE id = ?"
+SQL_FETCH_FEEDBACK = (
+    "SELECT id, author, content, rating, created_at "
+    "FROM feedback WHERE service_id = ? "
+    "ORDER BY id DESC LIMIT ? OFFSET ?"
+)
+SQL_FETCH_ALL_FEEDBACK = (
+    "SELECT f.id, f.author, f.content, f.rating, f.created_at, f.service_id, s.name AS service_name "
+    "FROM feedback f JOIN services s ON s.id = f.service_id "
+    "ORDER BY f.id DESC"
+)
+SQL_INSERT_FEEDBACK = (
+    "INSERT INTO feedback("
+    "service_id, author, content, rating, created_at"
+    f") VALUES (?, ?, ?, ?, {SQL_NOW})"
+)
+SQL_INSERT_SERVICE = (
+    "INSERT INTO services("
+    "name, name_lower, description, created_at, updated_at"
+    f") VALUES (?, ?, ?, {SQL_NOW}, {SQL_NOW})"
+)
+SQL_UPDATE_SERVICE = (
+    "UPDATE services SET name = ?, name_lower = ?, description = ?, "
+    f"updated_at = {SQL_NOW} WHERE id = ?"
+)
+SQL_DELETE_SERVICE = "DELETE FROM services WHERE id = ?"
+SQL_DELETE_FEEDBACK = "DELETE FROM feedback WHERE id = ?"
 
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        cached_statements=DB_CACHED_STATEMENTS,
+    )
     conn.row_factory = sqlite3.Row
+    conn.executescript(CONNECTION_PRAGMAS)
     return conn
 
 
+def init_pool(size: int = DB_POOL_SIZE):
+    for _ in range(size):
+        _POOL.put(get_db_connection())
+
+
+def close_connection(conn: sqlite3.Connection):
+    # Let SQLite refresh planner statistics it found stale while the
+    # connection was in use
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.OperationalError:
+        pass
+    conn.close()
+
+
+def close_pool():
+    while True:
+        try:
+            conn = _POOL.get_nowait()
+        except queue.Empty:
+            break
+        close_connection(conn)
+
+
+@contextmanager
+def db():
+    try:
+        conn = _POOL.get_nowait()
+    except queue.Empty:
+        # Pool is drained by concurrent requests: open a spare connection
+        conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        if _POOL.qsize() < DB_POOL_SIZE:
+            _POOL.put(conn)
+        else:
+            close_connection(conn)
+
+
 def init_db():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS services (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            name_lower TEXT,
-            description TEXT DEFAULT '',
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
+    with db() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS services (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                name_lower TEXT,
+                description TEXT DEFAULT '',
+                avg_rating REAL NOT NULL DEFAULT 0,
+                review_count INTEGER NOT NULL DEFAULT 0,
+                rating_sum INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
         )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            service_id INTEGER NOT NULL,
-            author TEXT DEFAULT 'Anonymous',
-            content TEXT NOT NULL,
-            rating INTEGER NOT NULL CHECK(rating >= 1 AND rating <= 5),
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(service_id) REFERENCES services(id) ON DELETE CASCADE
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                service_id INTEGER NOT NULL,
+                author TEXT DEFAULT 'Anonymous',
+                content TEXT NOT NULL,
+                rating INTEGER NOT NULL CHECK(rating >= 1 AND rating <= 5),
+                created_at TEXT NOT NULL,
+                FOREIGN KEY(service_id) REFERENCES services(id) ON DELETE CASCADE
+            )
+            """
         )
-        """
-    )
-    # Add rating column if it doesn't exist (for existing databases)
-    try:
-        cur.execute("ALTER TABLE feedback ADD COLUMN rating INTEGER DEFAULT 3")
+        # Add rating column if it doesn't exist (for existing databases)
+        try:
+            cur.execute("ALTER TABLE feedback ADD COLUMN rating INTEGER DEFAULT 3")
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        # Add name_lower column if missing and backfill
+        try:
+            cur.execute("ALTER TABLE services ADD COLUMN name_lower TEXT")
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass
+        cur.execute("UPDATE services SET name_lower = lower(name) WHERE name_lower IS NULL")
+        # Add denormalized rating columns if missing and backfill from feedback
+        backfill_ratings = False
+        for column in (
+            "avg_rating REAL NOT NULL DEFAULT 0",
+            "review_count INTEGER NOT NULL DEFAULT 0",
+            "rating_sum INTEGER NOT NULL DEFAULT 0",
+        ):
+            try:
+                cur.execute(f"ALTER TABLE services ADD COLUMN {column}")
+                backfill_ratings = True
+            except sqlite3.OperationalError:
+                pass  # Column already exists
+        if backfill_ratings:
+            cur.execute(
+                """
+                UPDATE services SET
+                    avg_rating = COALESCE(
+                        (SELECT AVG(rating) FROM feedback WHERE service_id = services.id), 0
+                    ),
+                    review_count = (
+                        SELECT COUNT(*) FROM feedback WHERE service_id = services.id
+                    ),
+                    rating_sum = COALESCE(
+                        (SELECT SUM(rating) FROM feedback WHERE service_id = services.id), 0
+                    )
+                """
+            )
         conn.commit()
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    # Add name_lower column if missing and backfill
-    try:
-        cur.execute("ALTER TABLE services ADD COLUMN name_lower TEXT")
+        # Feedback lookups/joins by service and the name-ordered service list
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_feedback_service ON feedback(service_id, id DESC)"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_services_name ON services(name)")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_services_rating "
+            "ON services(avg_rating DESC, review_count DESC)"
+        )
         conn.commit()
-    except sqlite3.OperationalError:
-        pass
-    cur.execute("UPDATE services SET name_lower = lower(name) WHERE name_lower IS NULL")
-    conn.commit()
-    conn.close()
+        # Keep services.avg_rating/review_count in step with feedback writes.
+        # Only the integer sum and count are updated incrementally; the average
+        # is re-derived from them, so it matches AVG(rating) exactly. Triggers
+        # are recreated so databases with older definitions pick them up; the
+        # swap is one write transaction so concurrent startups serialize and
+        # no live feedback write can land while the triggers are missing.
+        cur.executescript(
+            """
+            BEGIN IMMEDIATE;
+            DROP TRIGGER IF EXISTS feedback_rating_ai;
+            DROP TRIGGER IF EXISTS feedback_rating_ad;
+            DROP TRIGGER IF EXISTS feedback_rating_au;
+            CREATE TRIGGER feedback_rating_ai AFTER INSERT ON feedback BEGIN
+                UPDATE services SET
+                    rating_sum = rating_sum + new.rating,
+                    review_count = review_count + 1,
+                    avg_rating = (rating_sum + new.rating) * 1.0 / (review_count + 1)
+                WHERE id = new.service_id;
+            END;
+            CREATE TRIGGER feedback_rating_ad AFTER DELETE ON feedback BEGIN
+                UPDATE services SET
+                    rating_sum = rating_sum - old.rating,
+                    review_count = review_count - 1,
+                    avg_rating = CASE WHEN review_count > 1
+                        THEN (rating_sum - old.rating) * 1.0 / (review_count - 1)
+                        ELSE 0 END
+                WHERE id = old.service_id;
+            END;
+            CREATE TRIGGER feedback_rating_au
+            AFTER UPDATE OF rating, service_id ON feedback BEGIN
+                UPDATE services SET
+                    rating_sum = rating_sum - old.rating,
+                    review_count = review_count - 1,
+                    avg_rating = CASE WHEN review_count > 1
+                        THEN (rating_sum - old.rating) * 1.0 / (review_count - 1)
+                        ELSE 0 END
+                WHERE id = old.service_id;
+                UPDATE services SET
+                    rating_sum = rating_sum + new.rating,
+                    review_count = review_count + 1,
+                    avg_rating = (rating_sum + new.rating) * 1.0 / (review_count + 1)
+                WHERE id = new.service_id;
+            END;
+            COMMIT;
+            """
+        )
+        # Full-text index over services, kept in sync by triggers
+        fts_exists = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'services_fts'"
+        ).fetchone()
+        cur.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS services_fts USING fts5(
+                name, description, content='services', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS services_fts_ai AFTER INSERT ON services BEGIN
+                INSERT INTO services_fts(rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS services_fts_ad AFTER DELETE ON services BEGIN
+                INSERT INTO services_fts(services_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS services_fts_au
+            AFTER UPDATE OF name, description ON services BEGIN
+                INSERT INTO services_fts(services_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO services_fts(rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END;
+            """
+        )
+        if not fts_exists:
+            cur.execute("INSERT INTO services_fts(services_fts) VALUES ('rebuild')")
+            conn.commit()
+
+
+app = FastAPI(title="Pod Kapotom - Real Feedback", default_response_class=ORJSONResponse)
+
+
+load_dotenv()
+IS_PROD = os.getenv("ENV") == "prod"
+
+
+def create_template_env() -> Environment:
+    # In prod templates never change on disk: skip mtime checks and keep
+    # compiled bytecode across restarts. Without a directory argument Jinja
+    # uses a per-user temp directory it creates with mode 0700 and refuses
+    # to use if another user owns it
+    bytecode_cache = None
+    if IS_PROD:
+        bytecode_cache = FileSystemBytecodeCache()
+    return Environment(
+        loader=FileSystemLoader(str(TEMPLATES_DIR)),
+        autoescape=True,
+        auto_reload=not IS_PROD,
+        bytecode_cache=bytecode_cache,
+    )
+
 
+@lru_cache(maxsize=64)
+def _static_hash(file_path: str, mtime_ns: int) -> str:
+    return hashlib.sha1(pathlib.Path(file_path).read_bytes()).hexdigest()[:12]
 
-app = FastAPI(title="Pod Kapotom - Real Feedback")
+
+def static_url(path: str) -> str:
+    file_path = STATIC_DIR / path
+    try:
+        mtime_ns = file_path.stat().st_mtime_ns
+    except OSError:
+        return f"/static/{path}"
+    return f"/static/{path}?v={_static_hash(str(file_path), mtime_ns)}"
+
+
+class CachedStaticFiles(StaticFiles):
+    # Only a URL carrying the file's current hash (as built by static_url) may
+    # be cached forever; anything else revalidates
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if query.get("v") == [_static_hash(str(full_path), stat_result.st_mtime_ns)]:
+            response.headers["Cache-Control"] = STATIC_IMMUTABLE_CACHE
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
 
 
 # Static and templates
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+app.mount("/static", CachedStaticFiles(directory=str(STATIC_DIR)), name="static")
+templates = Jinja2Templates(env=create_template_env())
+templates.env.globals["static_url"] = static_url
 
 # Sessions for simple admin auth
-load_dotenv()
 SESSION_SECRET = os.getenv("SESSION_SECRET", "dev-secret-change-me")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "change-me")
+ADMIN_PASSWORD_B = ADMIN_PASSWORD.encode()
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
 
+# Rendered pages keyed by (version, ttl_bucket, path, query); any write in
+# this process bumps the version, and the TTL bucket expires pages whose data
+# another worker process changed
+_page_cache = {}
+_page_cache_version = 0
+_page_cache_lock = threading.Lock()
+
+
+def invalidate_page_cache():
+    global _page_cache_version
+    with _page_cache_lock:
+        _page_cache_version += 1
+        _page_cache.clear()
+
+
+@app.middleware("http")
+async def page_cache(request: Request, call_next):
+    # Only anonymous GETs are shared; a session cookie means a logged-in admin
+    if (
+        request.method != "GET"
+        or request.url.path not in CACHED_PAGES
+        or "session" in request.cookies
+    ):
+        return await call_next(request)
+    ttl_bucket = int(time.monotonic() // SERVICES_CACHE_TTL)
+    key = (_page_cache_version, ttl_bucket, request.url.path, request.url.query)
+    cached = _page_cache.get(key)
+    if cached is None:
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        cached = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        with _page_cache_lock:
+            if key[0] == _page_cache_version:
+                if len(_page_cache) >= PAGE_CACHE_MAX_ENTRIES:
+                    # Drop pages from expired TTL buckets before giving up
+                    for stale in [k for k in _page_cache if k[1] != ttl_bucket]:
+                        del _page_cache[stale]
+                if len(_page_cache) < PAGE_CACHE_MAX_ENTRIES:
+                    _page_cache[key] = cached
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
+
 
 class ServiceCreate(BaseModel):
     name: str = Field(min_length=2, max_length=200)
@@ -93,6 +440,17 @@ class ServiceUpdate(BaseModel):
     description: Optional[str] = None
 
 
+class FeedbackIn(BaseModel):
+    service_id: int
+    content: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+    author: Annotated[
+        str,
+        StringConstraints(strip_whitespace=True),
+        AfterValidator(lambda v: v or "Anonymous"),
+    ] = "Anonymous"
+    rating: int = Field(ge=1, le=5)
+
+
 def admin_auth(x_admin_token: Optional[str] = Header(default=None)):
     # Simple header token auth for demo; replace with proper auth in production
     expected = "secret-admin-token"
@@ -105,87 +463,106 @@ def is_admin(request: Request) -> bool:
     return bool(request.session.get("is_admin") is True)
 
 
+# Bumped by every services write; part of the sidebar cache key
+_services_version = 0
+
+
+def invalidate_services_cache():
+    global _services_version
+    _services_version += 1
+    # The sidebar list is rendered into every cached page
+    invalidate_page_cache()
+
+
+@lru_cache(maxsize=1)
+def _fetch_all_services_cached(version: int, ttl_bucket: int):
+    with db() as conn:
+        return conn.execute(SQL_FETCH_ALL).fetchall()
+
+
 def fetch_all_services():
-    conn = get_db_connection()
-    rows = conn.execute(
-        "SELECT id, name, description FROM services ORDER BY name ASC"
-    ).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    # The TTL bucket still expires the list when another worker process
+    # changed services and this one never saw the write
+    return _fetch_all_services_cached(
+        _services_version, int(time.monotonic() // SERVICES_CACHE_TTL)
+    )
 
 
 def fetch_services_with_ratings():
-    conn = get_db_connection()
-    rows = conn.execute(
-        """
-        SELECT s.id, s.name, s.description, 
-               COALESCE(AVG(f.rating), 0) as avg_rating,
-               COUNT(f.id) as review_count
-        FROM services s 
-        LEFT JOIN feedback f ON s.id = f.service_id 
-        GROUP BY s.id, s.name, s.description
-        ORDER BY avg_rating DESC, review_count DESC
-        """
-    ).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
-
-
-def fetch_top_services(limit=6):
-    conn = get_db_connection()
-    rows = conn.execute(
-        """
-        SELECT s.id, s.name, s.description, 
-               COALESCE(AVG(f.rating), 0) as avg_rating,
-               COUNT(f.id) as review_count
-        FROM services s 
-        LEFT JOIN feedback f ON s.id = f.service_id 
-        GROUP BY s.id, s.name, s.description
-        HAVING review_count > 0
-        ORDER BY avg_rating DESC, review_count DESC
-        LIMIT ?
-        """,
-        (limit,)
-    ).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
-
-
-def fetch_service_with_feedback(service_id: int):
-    conn = get_db_connection()
-    svc = conn.execute(
-        "SELECT id, name, description FROM services WHERE id = ?",
-        (service_id,),
-    ).fetchone()
-    if not svc:
-        conn.close()
-        return None, []
-    feedback = conn.execute(
-        (
-            "SELECT id, author, content, rating, created_at "
-            "FROM feedback WHERE service_id = ? "
-            "ORDER BY id DESC"
-        ),
-        (service_id,),
-    ).fetchall()
-    conn.close()
-    return dict(svc), [dict(fb) for fb in feedback]
+    with db() as conn:
+        return conn.execute(SQL_FETCH_RATINGS).fetchall()
+
+
+def build_search_query(search: str) -> Optional[str]:
+    # Every word must prefix-match a word in the service name
+    terms = re.findall(r"\w+", search)
+    if not terms:
+        return None
+    return "name : (" + " ".join(f'"{t}"*' for t in terms) + ")"
+
+
+def fetch_service_with_feedback(service_id: int, limit: int, offset: int = 0):
+    with db() as conn:
+        svc = conn.execute(SQL_FETCH_SERVICE, (service_id,)).fetchone()
+        if not svc:
+            return None, []
+        feedback = conn.execute(
+            SQL_FETCH_FEEDBACK, (service_id, limit, offset)
+        ).fetchall()
+    return svc, feedback
+
+
+def fetch_all_feedback():
+    with db() as conn:
+        return conn.execute(SQL_FETCH_ALL_FEEDBACK).fetchall()
+
+
+def analyze_db():
+    with db() as conn:
+        try:
+            conn.execute("ANALYZE")
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Database busy; next run catches up
+
+
+async def analyze_periodically():
+    # Pooled connections live for the whole process, so planner statistics
+    # are refreshed on a timer rather than only when a connection closes
+    while True:
+        await run_in_threadpool(analyze_db)
+        await asyncio.sleep(ANALYZE_INTERVAL)
+
+
+_analyze_task: Optional[asyncio.Task] = None
 
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    global _analyze_task
     # Ensure directories exist
     TEMPLATES_DIR.mkdir(parents=True, exist_ok=True)
     (STATIC_DIR / "css").mkdir(parents=True, exist_ok=True)
     (STATIC_DIR / "js").mkdir(parents=True, exist_ok=True)
+    init_pool()
     init_db()
+    _analyze_task = asyncio.create_task(analyze_periodically())
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if _analyze_task is not None:
+        _analyze_task.cancel()
+    close_pool()
 
 
 # Pages
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
-    services = fetch_all_services()
-    top_services = fetch_top_services(6)
+    # One aggregated query feeds both the top list and the sidebar
+    rated = fetch_services_with_ratings()
+    top_services = [s for s in rated if s["review_count"] > 0][:6]
+    services = sorted(rated, key=lambda s: s["name"])
     return templates.TemplateResponse(
         "home.html",
         {"request": request, "services": services, "top_services": top_services},
@@ -201,35 +578,24 @@ def services_page(request: Request, search: Optional[str] = None, min_rating: Op
             parsed_min_rating = float(min_rating)
         except ValueError:
             parsed_min_rating = None
-    
+
     if search or parsed_min_rating is not None:
         # Filtered search
-        conn = get_db_connection()
-        query = """
-        SELECT s.id, s.name, s.description, 
-               COALESCE(AVG(f.rating), 0) as avg_rating,
-               COUNT(f.id) as review_count
-        FROM services s 
-        LEFT JOIN feedback f ON s.id = f.service_id 
-        WHERE 1=1
-        """
-        params = []
         if search:
-            query += " AND s.name_lower LIKE ?"
-            params.append(f"%{search.casefold()}%")
-        if parsed_min_rating is not None:
-            query += " GROUP BY s.id, s.name, s.description HAVING avg_rating >= ?"
-            params.append(parsed_min_rating)
+            services = []
+            match = build_search_query(search)
+            if match:
+                with db() as conn:
+                    services = conn.execute(
+                        SQL_SEARCH_RATINGS,
+                        (match, parsed_min_rating, parsed_min_rating),
+                    ).fetchall()
         else:
-            query += " GROUP BY s.id, s.name, s.description"
-        query += " ORDER BY avg_rating DESC, review_count DESC"
-        
-        rows = conn.execute(query, params).fetchall()
-        conn.close()
-        services = [dict(r) for r in rows]
+            with db() as conn:
+                services = conn.execute(SQL_FILTER_RATINGS, (parsed_min_rating,)).fetchall()
     else:
         services = fetch_services_with_ratings()
-    
+
     return templates.TemplateResponse(
         "services.html",
         {"request": request, "services": services, "search": search, "min_rating": parsed_min_rating},
@@ -237,18 +603,32 @@ def services_page(request: Request, search: Optional[str] = None, min_rating: Op
 
 
 @app.get("/services/{service_id}", response_class=HTMLResponse)
-def service_detail(service_id: int, request: Request):
-    service, feedback = fetch_service_with_feedback(service_id)
+async def service_detail(
+    service_id: int,
+    request: Request,
+    page: int = Query(default=1, ge=1, le=FEEDBACK_PAGE_MAX),
+    size: int = Query(default=FEEDBACK_PAGE_SIZE, ge=1, le=FEEDBACK_PAGE_SIZE_MAX),
+):
+    # Independent lookups run side by side on the threadpool; one extra
+    # feedback row tells whether a next page exists
+    (service, feedback), services = await asyncio.gather(
+        run_in_threadpool(fetch_service_with_feedback, service_id, size + 1, (page - 1) * size),
+        run_in_threadpool(fetch_all_services),
+    )
     if service is None:
         raise HTTPException(status_code=404, detail="Service not found")
-    services = fetch_all_services()
-    return templates.TemplateResponse(
+    # TemplateResponse renders eagerly; keep that off the event loop
+    return await run_in_threadpool(
+        templates.TemplateResponse,
         "service_detail.html",
         {
             "request": request,
             "service": service,
-            "feedback": feedback,
+            "feedback": feedback[:size],
             "services": services,
+            "page": page,
+            "size": size,
+            "has_next": len(feedback) > size,
         },
     )
 
@@ -264,38 +644,19 @@ def about(request: Request):
 
 # Feedback submission (from floating modal form)
 @app.post("/feedback")
-def submit_feedback(
-    service_id: int = Form(...),
-    content: str = Form(...),
-    author: Optional[str] = Form(default="Anonymous"),
-    rating: int = Form(...),
-):
-    content = (content or "").strip()
-    author = (author or "Anonymous").strip() or "Anonymous"
-    if not content:
-        raise HTTPException(status_code=400, detail="Content is required")
-    if not (1 <= rating <= 5):
-        raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
-    # Ensure service exists
-    conn = get_db_connection()
-    svc = conn.execute(
-        "SELECT id FROM services WHERE id = ?",
-        (service_id,),
-    ).fetchone()
-    if not svc:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Service not found")
-    now = datetime.datetime.utcnow().isoformat()
-    conn.execute(
-        (
-            "INSERT INTO feedback("
-            "service_id, author, content, rating, created_at"
-            ") VALUES (?, ?, ?, ?, ?)"
-        ),
-        (service_id, author, content, rating, now),
-    )
-    conn.commit()
-    conn.close()
+def submit_feedback(payload: FeedbackIn = Form()):
+    service_id = payload.service_id
+    with db() as conn:
+        # The foreign key rejects feedback for a missing service
+        try:
+            conn.execute(
+                SQL_INSERT_FEEDBACK,
+                (service_id, payload.author, payload.content, payload.rating),
+            )
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=404, detail="Service not found")
+        conn.commit()
+    invalidate_page_cache()
     # Redirect back to the service detail page
     return RedirectResponse(url=f"/services/{service_id}", status_code=303)
 
@@ -303,26 +664,19 @@ def submit_feedback(
 # Admin CRUD for services (simple header token auth)
 @app.post("/admin/services", dependencies=[Depends(admin_auth)])
 def admin_create_service(payload: ServiceCreate):
-    now = datetime.datetime.utcnow().isoformat()
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        (
-            "INSERT INTO services("
-            "name, name_lower, description, created_at, updated_at"
-            ") VALUES (?, ?, ?, ?, ?)"
-        ),
-        (
-            payload.name.strip(),
-            payload.name.strip().casefold(),
-            (payload.description or "").strip(),
-            now,
-            now,
-        ),
-    )
-    conn.commit()
-    new_id = cur.lastrowid
-    conn.close()
+    with db() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            SQL_INSERT_SERVICE,
+            (
+                payload.name.strip(),
+                payload.name.strip().casefold(),
+                (payload.description or "").strip(),
+            ),
+        )
+        conn.commit()
+        new_id = cur.lastrowid
+    invalidate_services_cache()
     return {
         "id": new_id,
         "name": payload.name,
@@ -330,36 +684,43 @@ def admin_create_service(payload: ServiceCreate):
     }
 
 
+@app.post("/admin/services/bulk", dependencies=[Depends(admin_auth)])
+def admin_create_services_bulk(payload: list[ServiceCreate]):
+    rows = [
+        (item.name.strip(), item.name.strip().casefold(), (item.description or "").strip())
+        for item in payload
+    ]
+    with db() as conn:
+        # One write transaction (and one fsync) for the whole batch
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(SQL_INSERT_SERVICE, rows)
+        conn.commit()
+    invalidate_services_cache()
+    return {"created": len(rows)}
+
+
 @app.put("/admin/services/{service_id}", dependencies=[Depends(admin_auth)])
 def admin_update_service(service_id: int, payload: ServiceUpdate):
-    conn = get_db_connection()
-    existing = conn.execute(
-        "SELECT id, name, description FROM services WHERE id = ?",
-        (service_id,),
-    ).fetchone()
-    if not existing:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Service not found")
-    name = (
-        payload.name.strip()
-        if isinstance(payload.name, str)
-        else existing["name"]
-    )
-    description = (
-        payload.description.strip()
-        if isinstance(payload.description, str)
-        else existing["description"]
-    )
-    now = datetime.datetime.utcnow().isoformat()
-    conn.execute(
-        (
-            "UPDATE services SET name = ?, name_lower = ?, description = ?, "
-            "updated_at = ? WHERE id = ?"
-        ),
-        (name, name.casefold(), description, now, service_id),
-    )
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        existing = conn.execute(SQL_FETCH_SERVICE, (service_id,)).fetchone()
+        if not existing:
+            raise HTTPException(status_code=404, detail="Service not found")
+        name = (
+            payload.name.strip()
+            if isinstance(payload.name, str)
+            else existing["name"]
+        )
+        description = (
+            payload.description.strip()
+            if isinstance(payload.description, str)
+            else existing["description"]
+        )
+        conn.execute(
+            SQL_UPDATE_SERVICE,
+            (name, name.casefold(), description, service_id),
+        )
+        conn.commit()
+    invalidate_services_cache()
     return {
         "id": service_id,
         "name": name,
@@ -369,15 +730,12 @@ def admin_update_service(service_id: int, payload: ServiceUpdate):
 
 @app.delete("/admin/services/{service_id}", dependencies=[Depends(admin_auth)])
 def admin_delete_service(service_id: int):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "DELETE FROM services WHERE id = ?",
-        (service_id,),
-    )
-    conn.commit()
-    deleted = cur.rowcount
-    conn.close()
+    with db() as conn:
+        cur = conn.cursor()
+        cur.execute(SQL_DELETE_SERVICE, (service_id,))
+        conn.commit()
+        deleted = cur.rowcount
+    invalidate_services_cache()
     if deleted == 0:
         raise HTTPException(status_code=404, detail="Service not found")
     return {"status": "deleted", "id": service_id}
@@ -394,7 +752,7 @@ def admin_login_page(request: Request):
 
 @app.post("/admin/login")
 def admin_login(request: Request, password: str = Form(...)):
-    if password != ADMIN_PASSWORD:
+    if not hmac.compare_digest(password.encode(), ADMIN_PASSWORD_B):
         raise HTTPException(status_code=401, detail="Wrong password")
     request.session["is_admin"] = True
     return RedirectResponse(url="/admin/services", status_code=303)
@@ -432,19 +790,14 @@ def admin_create_service_form(
 ):
     require_admin(request)
     payload = ServiceCreate(name=name, description=description)
-    now = datetime.datetime.utcnow().isoformat()
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        (
-            "INSERT INTO services("
-            "name, description, created_at, updated_at"
-            ") VALUES (?, ?, ?, ?)"
-        ),
-        (payload.name.strip(), (payload.description or "").strip(), now, now),
-    )
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        name = payload.name.strip()
+        conn.execute(
+            SQL_INSERT_SERVICE,
+            (name, name.casefold(), (payload.description or "").strip()),
+        )
+        conn.commit()
+    invalidate_services_cache()
     return RedirectResponse(url="/admin/services", status_code=303)
 
 
@@ -456,55 +809,47 @@ def admin_update_service_form(
     description: str = Form("")
 ):
     require_admin(request)
-    now = datetime.datetime.utcnow().isoformat()
-    conn = get_db_connection()
-    conn.execute(
-        (
-            "UPDATE services SET name = ?, description = ?, "
-            "updated_at = ? WHERE id = ?"
-        ),
-        (name.strip(), (description or "").strip(), now, service_id),
-    )
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        name = name.strip()
+        conn.execute(
+            SQL_UPDATE_SERVICE,
+            (name, name.casefold(), (description or "").strip(), service_id),
+        )
+        conn.commit()
+    invalidate_services_cache()
     return RedirectResponse(url="/admin/services", status_code=303)
 
 
 @app.post("/admin/services/{service_id}/delete")
 def admin_delete_service_form(service_id: int, request: Request):
     require_admin(request)
-    conn = get_db_connection()
-    conn.execute("DELETE FROM services WHERE id = ?", (service_id,))
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        conn.execute(SQL_DELETE_SERVICE, (service_id,))
+        conn.commit()
+    invalidate_services_cache()
     return RedirectResponse(url="/admin/services", status_code=303)
 
 
 @app.get("/admin/feedback", response_class=HTMLResponse)
-def admin_feedback_page(request: Request):
+async def admin_feedback_page(request: Request):
     if not is_admin(request):
         return RedirectResponse(url="/admin/login", status_code=303)
-    conn = get_db_connection()
-    rows = conn.execute(
-        (
-            "SELECT f.id, f.author, f.content, f.rating, f.created_at, f.service_id, s.name AS service_name "
-            "FROM feedback f JOIN services s ON s.id = f.service_id "
-            "ORDER BY f.id DESC"
-        )
-    ).fetchall()
-    conn.close()
-    feedback = [dict(r) for r in rows]
-    return templates.TemplateResponse(
+    feedback, services = await asyncio.gather(
+        run_in_threadpool(fetch_all_feedback),
+        run_in_threadpool(fetch_all_services),
+    )
+    return await run_in_threadpool(
+        templates.TemplateResponse,
         "admin_feedback.html",
-        {"request": request, "services": fetch_all_services(), "feedback": feedback},
+        {"request": request, "services": services, "feedback": feedback},
     )
 
 
 @app.post("/admin/feedback/{feedback_id}/delete")
 def admin_delete_feedback(feedback_id: int, request: Request):
     require_admin(request)
-    conn = get_db_connection()
-    conn.execute("DELETE FROM feedback WHERE id = ?", (feedback_id,))
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        conn.execute(SQL_DELETE_FEEDBACK, (feedback_id,))
+        conn.commit()
+    invalidate_page_cache()
     return RedirectResponse(url="/admin/feedback", status_code=303)